@@ -1,116 +1,100 @@
 # app.py
 import streamlit as st
 import pandas as pd
-from pricing_model_complete import run_complete_pricing_model
-from google_drive_integration import GoogleDriveLoader
+from pricing_model_complete import run_complete_pricing_model, summarize_results, read_csv_pyarrow
+from google_drive_integration import GoogleDriveLoader, category_slug, pricing_input_files
+from styles import CSS, HEADER_HTML
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
 import io
 import tempfile
 import os
 
+# Columns the uploaded COGS file must provide
+REQUIRED_COGS_COLUMNS = frozenset(['product_id', 'COGS'])
+
+# Model inputs, in run_complete_pricing_model argument order ('<input>_file')
+MODEL_INPUTS = ('im_pricing', 'comp_pricing', 'necc_pricing', 'cogs', 'sdpo', 'stock', 'gmv', 'exclusion')
+
 # Page config
 st.set_page_config(page_title="Pricing Model", page_icon="💰", layout="wide")
 
-# Custom CSS for better styling and reduced gaps
-st.markdown("""
-    <style>
-    .main-header {
-        text-align: center;
-        padding: 1.2rem 0;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        border-radius: 12px;
-        margin-bottom: 1.5rem;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-    }
-    .main-header h1 {
-        margin: 0;
-        font-size: 2rem;
-        font-weight: 700;
-    }
-    .main-header p {
-        margin: 0.5rem 0 0 0;
-        font-size: 1rem;
-        opacity: 0.95;
-    }
-    .upload-card {
-        background: linear-gradient(to right, #f8f9fa 0%, #e9ecef 100%);
-        padding: 1.2rem;
-        border-radius: 10px;
-        border-left: 5px solid #667eea;
-        margin-bottom: 1rem;
-        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.05);
-    }
-    .section-title {
-        font-size: 1.2rem;
-        font-weight: 700;
-        color: #667eea;
-        margin-bottom: 0.5rem;
-    }
-    .stButton>button {
-        height: 3.5rem;
-        font-size: 1.2rem;
-        font-weight: 700;
-        border-radius: 10px;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        border: none;
-        transition: all 0.3s ease;
-    }
-    .stButton>button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 6px 12px rgba(102, 126, 234, 0.4);
-    }
-    /* Reduce spacing between sections */
-    .block-container {
-        padding-top: 1rem;
-        padding-bottom: 1rem;
-    }
-    div[data-testid="stExpander"] {
-        margin-bottom: 0.8rem;
-        background-color: #f8f9fa;
-        border-radius: 8px;
-    }
-    div[data-testid="stSelectbox"],
-    div[data-testid="stNumberInput"] {
-        margin-bottom: 0rem;
-    }
-    div[data-testid="stFileUploader"] {
-        margin-bottom: 0rem;
-    }
-    div[data-testid="column"] {
-        padding: 0.5rem;
-    }
-    div[data-baseweb="notification"] {
-        border-radius: 8px;
-        margin-bottom: 1rem;
-    }
-    div[data-testid="stMetric"] {
-        background-color: #f8f9fa;
-        padding: 1rem;
-        border-radius: 8px;
-        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.05);
-    }
-    .element-container:has(> .stSuccess),
-    .element-container:has(> .stError) {
-        margin-top: 0.3rem;
-        margin-bottom: 0.3rem;
-    }
-    .element-container {
-        margin-bottom: 0.5rem;
-    }
-    .stCaption {
-        color: #6c757d;
-        font-weight: 500;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+# ==================== HELPERS ====================
+@st.cache_data(show_spinner=False)
+def parse_upload(file_bytes):
+    """Parse an uploaded CSV, cached on its bytes so widget reruns skip the re-parse"""
+    # pyarrow's multithreaded block parser is several times faster than the C engine
+    # and avoids its peak-memory spike on large uploads
+    return read_csv_pyarrow(io.BytesIO(file_bytes))
+
+def hash_frame(df):
+    """Content hash for st.cache_data keys (column names + row values)"""
+    return tuple(df.columns), pd.util.hash_pandas_object(df, index=False).values.tobytes()
+
+def write_model_inputs(input_frames, directory):
+    """Write input frames as CSVs into directory; returns the model's file arguments (None for missing inputs)"""
+    os.makedirs(directory, exist_ok=True)
+    file_args = {}
+    for key in MODEL_INPUTS:
+        df = input_frames.get(key)
+        if df is None:
+            file_args[f'{key}_file'] = None
+            continue
+        file_args[f'{key}_file'] = os.path.join(directory, f'{key}.csv')
+        df.to_csv(file_args[f'{key}_file'], index=False)
+    return file_args
+
+@st.cache_data(show_spinner=False, max_entries=8, hash_funcs={pd.DataFrame: hash_frame})
+def run_pricing_model_cached(input_frames, target_margin, category):
+    """Run the pricing model on in-memory inputs; identical inputs return the cached result"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        return run_complete_pricing_model(
+            **write_model_inputs(input_frames, tmpdir),
+            target_margin=target_margin,
+            category=category
+        )
+
+def frame_to_parquet(df):
+    """Parquet bytes for a download, or None if a column can't be stored as Parquet"""
+    try:
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        return buffer.getvalue()
+    except Exception:
+        return None
+
+PREVIEW_COLUMNS = ['ITEM_CODE', 'ITEM_NAME', 'cogs', 'Final Price', 'Final NM %', 
+                   'Final SDPO %', 'category', 'target_margin_%']
+
+def preview_frame(df, rows=10):
+    """First rows of the results, limited to the preview columns (head first, then project)"""
+    available_cols = [col for col in PREVIEW_COLUMNS if col in df.columns]
+    return df.head(rows)[available_cols]
+
+def validate_cogs(cogs_df):
+    """Stop the run with an error if the COGS upload lacks a required column"""
+    missing_cogs_cols = REQUIRED_COGS_COLUMNS - set(cogs_df.columns)
+    if missing_cogs_cols:
+        st.error(f"❌ COGS file is missing required columns: {', '.join(sorted(missing_cogs_cols))}")
+        st.error(f"Found columns: {', '.join(cogs_df.columns.tolist())}")
+        st.stop()
+
+def store_results(results_df, summary, results_slug):
+    """Keep a model run's results and their exports in session state"""
+    st.session_state.results_df = results_df
+    st.session_state.summary = summary
+    st.session_state.results_slug = results_slug
+    st.session_state.results_csv = results_df.to_csv(index=False).encode('utf-8')
+    st.session_state.results_parquet = frame_to_parquet(results_df)
+    st.session_state.results_preview = preview_frame(results_df)
+    st.session_state.model_run = True
+
+# Custom CSS for better styling and reduced gaps (re-rendered each run:
+# Streamlit drops elements a rerun does not emit)
+st.markdown(CSS, unsafe_allow_html=True)
 
 # Header
-st.markdown("""
-    <div class="main-header">
-        <h1>💰 Dynamic Pricing Engine</h1>
-        <p>Smart pricing recommendations powered by data analytics</p>
-    </div>
-    """, unsafe_allow_html=True)
+st.markdown(HEADER_HTML, unsafe_allow_html=True)
 
 # Initialize session state
 if 'results_df' not in st.session_state:
@@ -119,6 +103,14 @@ if 'model_run' not in st.session_state:
     st.session_state.model_run = False
 if 'summary' not in st.session_state:
     st.session_state.summary = None
+if 'results_csv' not in st.session_state:
+    st.session_state.results_csv = None
+if 'results_parquet' not in st.session_state:
+    st.session_state.results_parquet = None
+if 'results_preview' not in st.session_state:
+    st.session_state.results_preview = None
+if 'results_slug' not in st.session_state:
+    st.session_state.results_slug = None
 if 'gdrive_authenticated' not in st.session_state:
     st.session_state.gdrive_authenticated = False
 if 'gdrive_loader' not in st.session_state:
@@ -290,6 +282,8 @@ if st.session_state.gdrive_authenticated:
             folder_name_input = st.text_input("🔍 Test Folder Name", value="Pricing Inputs")
             if st.button("🔎 Check Folder Access", use_container_width=True):
                 with st.spinner(f"Searching for folder '{folder_name_input}'..."):
+                    # Look the folder up fresh (it may have been re-shared or recreated)
+                    st.session_state.gdrive_loader.clear_cache()
                     folder_id = st.session_state.gdrive_loader.find_folder(folder_name_input)
                     if folder_id:
                         st.success(f"✅ Found folder with ID: `{folder_id}`")
@@ -312,6 +306,11 @@ if st.session_state.gdrive_authenticated:
                         3. Share the folder with your service account email
                         """)
         
+        # Downloaded Drive files are cached on this machine between runs
+        if st.button("🧹 Clear Local File Cache", use_container_width=True):
+            st.session_state.gdrive_loader.clear_file_cache()
+            st.success("✅ Local copies of Drive files deleted; the next run downloads them again")
+        
         # Service account info
         st.markdown("---")
         st.markdown("**📧 Service Account Information**")
@@ -348,14 +347,14 @@ with col1:
     st.caption("**COGS Data** _(Required: product_id, COGS, CITY)_")
     cogs_file = st.file_uploader("COGS", type=['csv'], key="cogs", label_visibility="collapsed")
     if cogs_file:
-        uploaded_files['cogs'] = pd.read_csv(cogs_file)
+        uploaded_files['cogs'] = parse_upload(cogs_file.getvalue())
         st.success(f"✓ {len(uploaded_files['cogs']):,} rows uploaded")
 
 with col2:
     st.caption("**Brand Aligned Discount (SDPO)** _(Optional: Brand, Hardcoded_SDPO)_")
     sdpo_file = st.file_uploader("SDPO", type=['csv'], key="sdpo", label_visibility="collapsed")
     if sdpo_file:
-        uploaded_files['sdpo'] = pd.read_csv(sdpo_file)
+        uploaded_files['sdpo'] = parse_upload(sdpo_file.getvalue())
         st.success(f"✓ {len(uploaded_files['sdpo']):,} rows uploaded")
 
 st.markdown('</div>', unsafe_allow_html=True)
@@ -375,121 +374,158 @@ run_button = st.button(
     disabled=not is_ready
 )
 
+# Every category's inputs live in Google Drive, so Run All needs the connection
+run_all_button = st.button(
+    "🗂️ RUN ALL CATEGORIES",
+    use_container_width=True,
+    disabled=not (is_ready and st.session_state.gdrive_authenticated),
+    help="Price every category in parallel with the uploaded COGS file (requires Google Drive)"
+)
+
 # ==================== PROCESS MODEL ====================
 if run_button:
     try:
         with st.spinner("⏳ Loading data and processing..."):
             
-            # Create temporary directory for all files
-            with tempfile.TemporaryDirectory() as tmpdir:
-                
-                # Prepare file paths dictionary
-                file_paths = {}
-                
-                # Category-specific file names
-                category_slug = selected_category.lower().replace(' ', '_')
+            # Model input frames, keyed by input name
+            input_frames = {}
+            
+            # Required files from Google Drive (category-specific names)
+            gdrive_files = pricing_input_files(selected_category)
+            
+            # Fetch files from Google Drive if authenticated
+            if st.session_state.gdrive_authenticated:
+                st.write("📥 Fetching files from Google Drive...")
                 
-                # Define required files from Google Drive
-                gdrive_files = {
-                    'im_pricing': f'{category_slug}_im_pricing.csv',
-                    'comp_pricing': f'{category_slug}_pricing_comp.csv',
-                    'necc_pricing': 'necc_egg_prices_cleaned.csv',
-                    'stock': 'stock_insights.csv',
-                    'gmv': 'gmv_weights.csv',
-                    'exclusion': 'city_brand_exclusion_list.csv'
-                }
+                gdrive_frames = st.session_state.gdrive_loader.load_all_pricing_inputs(selected_category)
                 
-                # Fetch files from Google Drive if authenticated
-                if st.session_state.gdrive_authenticated:
-                    st.write("📥 Fetching files from Google Drive...")
-                    
-                    folder_name = "Pricing Inputs"
+                for key, filename in gdrive_files.items():
+                    df = gdrive_frames[key]
                     
-                    for key, filename in gdrive_files.items():
-                        try:
-                            st.write(f"   Downloading {filename}...")
-                            df = st.session_state.gdrive_loader.load_file_by_name(folder_name, filename)
-                            
-                            if df is not None and not df.empty:
-                                # Save to temp directory
-                                temp_path = os.path.join(tmpdir, filename)
-                                df.to_csv(temp_path, index=False)
-                                file_paths[key] = temp_path
-                                st.success(f"   ✓ {filename} loaded ({len(df):,} rows)")
-                            else:
-                                st.warning(f"   ⚠️ {filename} not found or empty")
-                                file_paths[key] = None
-                        except Exception as e:
-                            st.warning(f"   ⚠️ Could not load {filename}: {str(e)}")
-                            file_paths[key] = None
-                else:
-                    # Manual upload mode - all files must be uploaded
-                    st.warning("⚠️ Google Drive not connected. Please ensure all required files are available.")
-                    # Set paths to None for now
-                    for key in gdrive_files.keys():
-                        file_paths[key] = None
+                    if df is not None and not df.empty:
+                        input_frames[key] = df
+                        st.success(f"   ✓ {filename} loaded ({len(df):,} rows)")
+                    else:
+                        st.warning(f"   ⚠️ {filename} not found or empty")
+                        input_frames[key] = None
+            else:
+                # Manual upload mode - all files must be uploaded
+                st.warning("⚠️ Google Drive not connected. Please ensure all required files are available.")
+                # Set inputs to None for now
+                for key in gdrive_files.keys():
+                    input_frames[key] = None
+            
+            # Handle uploaded COGS file
+            if 'cogs' in uploaded_files:
+                cogs_df = uploaded_files['cogs']
                 
-                # Handle uploaded COGS file
-                if 'cogs' in uploaded_files:
-                    cogs_df = uploaded_files['cogs']
-                    
-                    # Validate COGS file columns
-                    required_cogs_cols = ['product_id', 'COGS']
-                    if not all(col in cogs_df.columns for col in required_cogs_cols):
-                        st.error(f"❌ COGS file must contain columns: {', '.join(required_cogs_cols)}")
-                        st.error(f"Found columns: {', '.join(cogs_df.columns.tolist())}")
-                        st.stop()
-                    
-                    # Prepare COGS data
-                    if 'product_name' not in cogs_df.columns:
-                        cogs_df['product_name'] = 'Product ' + cogs_df['product_id'].astype(str)
+                # Validate COGS file columns
+                validate_cogs(cogs_df)
+                
+                # The model only reads product_id, CITY and COGS
+                input_frames['cogs'] = cogs_df
+            
+            # Handle uploaded SDPO file
+            input_frames['sdpo'] = uploaded_files.get('sdpo')
+            
+            # Validate that we have minimum required files
+            if input_frames.get('im_pricing') is None or input_frames.get('comp_pricing') is None:
+                st.error("❌ Missing required files: IM Pricing and Competition Pricing must be available")
+                st.info("""
+                **What to do:**
+                1. Check the Debug section above to verify Google Drive access
+                2. Make sure files exist in your 'Pricing Inputs' folder
+                3. Verify file names match exactly (case-sensitive)
+                """)
+                st.stop()
+            
+            # Run the complete pricing model (cached on the inputs)
+            st.write("🔄 Running pricing model...")
+            results_df, summary = run_pricing_model_cached(input_frames, target_margin, selected_category)
+            
+            # Store in session state
+            store_results(results_df, summary, category_slug(selected_category))
+    
+    except Exception as e:
+        st.error(f"❌ Error: {str(e)}")
+        import traceback
+        st.code(traceback.format_exc())
+
+# ==================== PROCESS ALL CATEGORIES ====================
+if run_all_button:
+    try:
+        with st.spinner("⏳ Loading data and pricing all categories..."):
+            cogs_df = uploaded_files['cogs']
+            validate_cogs(cogs_df)
+            
+            # Fetch every category's files in one batch (shared files are listed once)
+            st.write("📥 Fetching files from Google Drive...")
+            category_files = {category: pricing_input_files(category) for category in categories}
+            file_names = list(dict.fromkeys(
+                filename for files in category_files.values() for filename in files.values()
+            ))
+            gdrive_frames = st.session_state.gdrive_loader.load_files_by_name("Pricing Inputs", file_names)
+            
+            with tempfile.TemporaryDirectory() as tmpdir:
+                # Write each runnable category's inputs once; workers only receive file paths
+                jobs = {}
+                for category, files in category_files.items():
+                    input_frames = {}
+                    for key, filename in files.items():
+                        df = gdrive_frames.get(filename)
+                        input_frames[key] = df if df is not None and not df.empty else None
                     
-                    if 'COGS' in cogs_df.columns and 'cogs' not in cogs_df.columns:
-                        cogs_df['cogs'] = cogs_df['COGS']
+                    if input_frames['im_pricing'] is None or input_frames['comp_pricing'] is None:
+                        st.warning(f"   ⚠️ {category}: IM or competition pricing not found, skipped")
+                        continue
                     
-                    # Save COGS to temp directory
-                    cogs_path = os.path.join(tmpdir, 'cogs.csv')
-                    cogs_df.to_csv(cogs_path, index=False)
-                    file_paths['cogs'] = cogs_path
-                
-                # Handle uploaded SDPO file
-                sdpo_path = None
-                if 'sdpo' in uploaded_files:
-                    sdpo_df = uploaded_files['sdpo']
-                    sdpo_path = os.path.join(tmpdir, 'sdpo.csv')
-                    sdpo_df.to_csv(sdpo_path, index=False)
-                    file_paths['sdpo'] = sdpo_path
+                    input_frames['cogs'] = cogs_df
+                    input_frames['sdpo'] = uploaded_files.get('sdpo')
+                    jobs[category] = write_model_inputs(input_frames, os.path.join(tmpdir, category_slug(category)))
                 
-                # Validate that we have minimum required files
-                if file_paths.get('im_pricing') is None or file_paths.get('comp_pricing') is None:
-                    st.error("❌ Missing required files: IM Pricing and Competition Pricing must be available")
-                    st.info("""
-                    **What to do:**
-                    1. Check the Debug section above to verify Google Drive access
-                    2. Make sure files exist in your 'Pricing Inputs' folder
-                    3. Verify file names match exactly (case-sensitive)
-                    """)
+                if not jobs:
+                    st.error("❌ No category has both IM Pricing and Competition Pricing files in Google Drive")
                     st.stop()
                 
-                # Run the complete pricing model
-                st.write("🔄 Running pricing model...")
-                results_df, summary = run_complete_pricing_model(
-                    im_pricing_file=file_paths['im_pricing'],
-                    comp_pricing_file=file_paths['comp_pricing'],
-                    necc_pricing_file=file_paths.get('necc_pricing'),
-                    cogs_file=file_paths['cogs'],
-                    sdpo_file=file_paths.get('sdpo'),
-                    stock_file=file_paths.get('stock'),
-                    gmv_file=file_paths.get('gmv'),
-                    exclusion_file=file_paths.get('exclusion'),
-                    target_margin=target_margin,
-                    category=selected_category
-                )
+                # Categories are independent and CPU-bound, so run them in separate processes.
+                # Spawn rather than fork: this server process is multi-threaded, and a forked
+                # worker can inherit a lock (logging, pyarrow's pool) held by another thread
+                st.write(f"🔄 Running pricing model for {len(jobs)} categories...")
+                category_results = {}
+                with ProcessPoolExecutor(
+                    max_workers=min(len(jobs), os.cpu_count() or 1),
+                    mp_context=multiprocessing.get_context('spawn')
+                ) as executor:
+                    futures = {
+                        executor.submit(
+                            run_complete_pricing_model,
+                            **file_args,
+                            target_margin=target_margin,
+                            category=category
+                        ): category
+                        for category, file_args in jobs.items()
+                    }
+                    for future in as_completed(futures):
+                        category = futures[future]
+                        try:
+                            category_results[category], _ = future.result()
+                            st.success(f"   ✓ {category}: {len(category_results[category]):,} prices")
+                        except Exception as e:
+                            st.warning(f"   ⚠️ {category} failed: {e}")
+            
+            if not category_results:
+                st.error("❌ Pricing failed for every category")
+                st.stop()
+            
+            # Combine in category order; rows already carry their 'category' column
+            results_df = pd.concat(
+                [category_results[category] for category in categories if category in category_results],
+                ignore_index=True
+            )
+            summary = summarize_results(results_df)
             
             # Store in session state
-            st.session_state.results_df = results_df
-            st.session_state.summary = summary
-            st.session_state.model_run = True
+            store_results(results_df, summary, 'all_categories')
     
     except Exception as e:
         st.error(f"❌ Error: {str(e)}")
@@ -518,15 +554,11 @@ if st.session_state.model_run and st.session_state.results_df is not None:
     
     st.markdown('</div>', unsafe_allow_html=True)
     
-    # Table Preview
+    # Table Preview (sliced once per model run)
     st.markdown("### 📋 Modeled Prices Preview (First 10 Rows)")
     
-    display_cols = ['ITEM_CODE', 'ITEM_NAME', 'cogs', 'Final Price', 'Final NM %', 
-                   'Final SDPO %', 'category', 'target_margin_%']
-    available_cols = [col for col in display_cols if col in results_df.columns]
-    
     st.dataframe(
-        results_df[available_cols].head(10), 
+        st.session_state.results_preview, 
         use_container_width=True, 
         height=350,
         hide_index=True
@@ -535,13 +567,22 @@ if st.session_state.model_run and st.session_state.results_df is not None:
     # Download Button
     st.markdown("### 📥 Download Modeled Prices")
     
-    # Modeled Prices CSV
-    csv = results_df.to_csv(index=False)
+    # Modeled Prices CSV (serialized once per model run, not on every rerun)
     st.download_button(
         label="📊 DOWNLOAD MODELED PRICES (CSV)",
-        data=csv,
-        file_name=f"modeled_prices_{selected_category.replace(' ', '_').lower()}.csv",
+        data=st.session_state.results_csv,
+        file_name=f"modeled_prices_{st.session_state.results_slug}.csv",
         mime="text/csv",
         use_container_width=True,
         type="primary"
     )
+    
+    # Modeled Prices Parquet (much smaller, typed download for analysts)
+    if st.session_state.results_parquet is not None:
+        st.download_button(
+            label="🗂️ DOWNLOAD MODELED PRICES (PARQUET)",
+            data=st.session_state.results_parquet,
+            file_name=f"modeled_prices_{st.session_state.results_slug}.parquet",
+            mime="application/octet-stream",
+            use_container_width=True
+        )
@@ -3,15 +3,58 @@ import streamlit as st
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from types import MappingProxyType
+from pricing_model_complete import read_csv_pyarrow
 import io
+import logging
 import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+# Concurrent Drive downloads; stays well inside the per-user request quota
+MAX_DOWNLOAD_WORKERS = 8
+
+# Download chunk size (the client default is 100 KiB, i.e. one HTTPS request per 100 KiB)
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Local copies of downloaded files, keyed by Drive file ID and modifiedTime (owner-only permissions).
+# Set PRICING_INPUT_CACHE_DIR to move it, or to an empty string to turn the cache off.
+CACHE_DIR = os.environ.get(
+    'PRICING_INPUT_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'pricing_inputs')
+)
+
+
+@lru_cache(maxsize=16)
+def category_slug(category):
+    """File-name slug for a category, e.g. 'Milk Based Drinks' -> 'milk_based_drinks'"""
+    return category.lower().replace(' ', '_')
+
+
+@lru_cache(maxsize=16)
+def pricing_input_files(category):
+    """Drive file names of a category's pricing inputs, keyed by model input (read-only: the cache entry is shared)"""
+    slug = category_slug(category)
+    return MappingProxyType({
+        'im_pricing': f'{slug}_im_pricing.csv',
+        'comp_pricing': f'{slug}_pricing_comp.csv',
+        'necc_pricing': 'necc_egg_prices_cleaned.csv',
+        'stock': 'stock_insights.csv',
+        'gmv': 'gmv_weights.csv',
+        'exclusion': 'city_brand_exclusion_list.csv'
+    })
 
 class GoogleDriveLoader:
     def __init__(self, credentials_path=None):
         self.credentials = None
         self.service = None
         self.credentials_path = credentials_path
+        self._folder_ids = {}
+        self._modified_times = {}
+        self._thread_local = threading.local()
         
     def authenticate(self):
         """Authenticate with Google Drive using service account"""
@@ -32,13 +75,18 @@ class GoogleDriveLoader:
             else:
                 return False
                 
-            self.service = build('drive', 'v3', credentials=self.credentials)
+            self.service = build('drive', 'v3', credentials=self.credentials, cache_discovery=False)
             return True
             
         except Exception as e:
             st.error(f"❌ Authentication failed: {e}")
             return False
     
+    def clear_cache(self):
+        """Forget cached folder IDs and file versions so the next lookup goes to Drive"""
+        self._folder_ids.clear()
+        self._modified_times.clear()
+    
     def list_all_folders(self):
         """List all folders accessible to the service account (for debugging)"""
         try:
@@ -59,24 +107,29 @@ class GoogleDriveLoader:
     
     def find_folder(self, folder_name):
         """Find folder ID by name (case-insensitive search)"""
+        if folder_name in self._folder_ids:
+            return self._folder_ids[folder_name]
+        
         try:
             # First try exact match
             query = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
             results = self.service.files().list(
                 q=query,
                 spaces='drive',
-                fields='files(id, name, parents)',
-                pageSize=10
+                fields='files(id)',
+                pageSize=1
             ).execute()
             
             items = results.get('files', [])
             if items:
+                self._folder_ids[folder_name] = items[0]['id']
                 return items[0]['id']
             
             # If not found, try case-insensitive search
             all_folders = self.list_all_folders()
             for folder in all_folders:
                 if folder['name'].lower() == folder_name.lower():
+                    self._folder_ids[folder_name] = folder['id']
                     return folder['id']
             
             return None
@@ -85,40 +138,45 @@ class GoogleDriveLoader:
             st.error(f"Error finding folder: {e}")
             return None
     
-    def find_file_in_folder(self, folder_id, file_name):
-        """Find file ID by name within a specific folder"""
-        try:
-            query = f"name='{file_name}' and '{folder_id}' in parents and trashed=false"
+    def _list_folder_index(self, folder_id):
+        """Map file name -> ID for every file in a folder, following pageToken until exhausted"""
+        index = {}
+        page_token = None
+        while True:
             results = self.service.files().list(
-                q=query,
+                q=f"'{folder_id}' in parents and trashed=false",
                 spaces='drive',
-                fields='files(id, name, mimeType)',
-                pageSize=10
+                fields='nextPageToken, files(id, name, modifiedTime)',
+                pageSize=1000,
+                pageToken=page_token
             ).execute()
             
-            items = results.get('files', [])
-            if items:
-                return items[0]['id']
+            for item in results.get('files', []):
+                index.setdefault(item['name'], item['id'])
+                self._modified_times[item['id']] = item.get('modifiedTime')
             
-            # Try case-insensitive search
-            query = f"'{folder_id}' in parents and trashed=false"
-            results = self.service.files().list(
-                q=query,
-                spaces='drive',
-                fields='files(id, name, mimeType)',
-                pageSize=100
-            ).execute()
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return index
+    
+    def find_files_in_folder(self, folder_id, file_names):
+        """Find file IDs for several names within a folder from one folder listing"""
+        try:
+            index = self._list_folder_index(folder_id)
             
-            items = results.get('files', [])
-            for item in items:
-                if item['name'].lower() == file_name.lower():
-                    return item['id']
+            # Exact match first, then a case-insensitive match
+            lower_index = {}
+            for name, file_id in index.items():
+                lower_index.setdefault(name.lower(), file_id)
             
-            return None
+            return {
+                file_name: index.get(file_name) or lower_index.get(file_name.lower())
+                for file_name in file_names
+            }
             
         except Exception as e:
-            st.error(f"Error finding file: {e}")
-            return None
+            st.error(f"Error finding files: {e}")
+            return {}
     
     def list_files_in_folder(self, folder_id):
         """List all files in a folder (for debugging)"""
@@ -138,62 +196,113 @@ class GoogleDriveLoader:
             st.error(f"Error listing files: {e}")
             return []
     
-    def download_file(self, file_id):
-        """Download file content as bytes"""
-        try:
-            request = self.service.files().get_media(fileId=file_id)
-            file_buffer = io.BytesIO()
-            downloader = MediaIoBaseDownload(file_buffer, request)
-            
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-            
-            file_buffer.seek(0)
-            return file_buffer
-            
-        except Exception as e:
-            st.error(f"Error downloading file: {e}")
+    def _thread_service(self):
+        """Drive client owned by the calling thread (httplib2 connections are not thread-safe)"""
+        service = getattr(self._thread_local, 'service', None)
+        if service is None:
+            service = build('drive', 'v3', credentials=self.credentials, cache_discovery=False)
+            self._thread_local.service = service
+        return service
+    
+    def _download(self, service, file_id):
+        request = service.files().get_media(fileId=file_id)
+        file_buffer = io.BytesIO()
+        downloader = MediaIoBaseDownload(file_buffer, request, chunksize=DOWNLOAD_CHUNK_SIZE)
+        
+        done = False
+        while not done:
+            status, done = downloader.next_chunk()
+        
+        file_buffer.seek(0)
+        return file_buffer
+    
+    def _cache_path(self, file_id):
+        """Local cache file for a Drive file's current version, or None if its modifiedTime is unknown"""
+        modified_time = self._modified_times.get(file_id)
+        if not CACHE_DIR or not modified_time:
             return None
+        return os.path.join(CACHE_DIR, f"{file_id}_{modified_time.replace(':', '-')}.csv")
     
-    def load_file_by_name(self, folder_name, file_name):
-        """Load CSV file from Google Drive by folder and file name"""
+    def _store_cached(self, file_id, cache_path, data):
+        """Write a downloaded file to the cache, replacing older versions (best effort)"""
         try:
-            # Find folder
-            folder_id = self.find_folder(folder_name)
-            if not folder_id:
-                # Debug: List all available folders
-                st.warning(f"⚠️ Folder '{folder_name}' not found. Listing available folders:")
-                all_folders = self.list_all_folders()
-                if all_folders:
-                    folder_names = [f"  • {f['name']}" for f in all_folders[:10]]
-                    st.code("\n".join(folder_names))
-                else:
-                    st.warning("No folders found. Make sure the service account has access to the folder.")
-                return None
-            
-            # Find file
-            file_id = self.find_file_in_folder(folder_id, file_name)
-            if not file_id:
-                # Debug: List all files in folder
-                st.warning(f"⚠️ File '{file_name}' not found. Files in folder '{folder_name}':")
-                files_in_folder = self.list_files_in_folder(folder_id)
-                if files_in_folder:
-                    file_names = [f"  • {f['name']}" for f in files_in_folder[:20]]
-                    st.code("\n".join(file_names))
-                return None
-            
-            # Download file
-            file_buffer = self.download_file(file_id)
-            if not file_buffer:
-                return None
-            
-            # Read as CSV
-            df = pd.read_csv(file_buffer)
-            return df
+            os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+            os.chmod(CACHE_DIR, 0o700)  # also tightens a directory created before this mode was set
+            for name in os.listdir(CACHE_DIR):
+                # Leave .tmp files alone: they are another writer's in-flight download
+                if name.startswith(f"{file_id}_") and not name.endswith('.tmp'):
+                    os.remove(os.path.join(CACHE_DIR, name))
             
-        except Exception as e:
-            st.error(f"Error loading file '{file_name}': {e}")
-            import traceback
-            st.code(traceback.format_exc())
-            return None
+            tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+            with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
+    
+    def clear_file_cache(self):
+        """Delete every locally cached Drive file (in-flight .tmp downloads are left to their writers)"""
+        if not CACHE_DIR or not os.path.isdir(CACHE_DIR):
+            return
+        for name in os.listdir(CACHE_DIR):
+            if not name.endswith('.tmp'):
+                try:
+                    os.remove(os.path.join(CACHE_DIR, name))
+                except OSError:
+                    pass
+    
+    def _download_csv(self, file_id):
+        """Download and parse one CSV, served from the local cache when unchanged; runs on a download worker thread"""
+        cache_path = self._cache_path(file_id)
+        if cache_path and os.path.exists(cache_path):
+            logger.info("Drive file %s unchanged, read from %s", file_id, cache_path)
+            return read_csv_pyarrow(cache_path)
+        
+        file_buffer = self._download(self._thread_service(), file_id)
+        logger.info("Downloaded Drive file %s (%d bytes)", file_id, file_buffer.getbuffer().nbytes)
+        if cache_path:
+            self._store_cached(file_id, cache_path, file_buffer.getvalue())
+        return read_csv_pyarrow(file_buffer)
+    
+    def load_files_by_name(self, folder_name, file_names):
+        """Load several CSV files from one Google Drive folder, keyed by file name"""
+        frames = {file_name: None for file_name in file_names}
+        
+        folder_id = self.find_folder(folder_name)
+        if not folder_id:
+            st.warning(f"⚠️ Folder '{folder_name}' not found. Make sure the service account has access to the folder.")
+            return frames
+        
+        file_ids = self.find_files_in_folder(folder_id, file_names)
+        to_download = {}
+        for file_name in file_names:
+            if file_ids.get(file_name):
+                to_download[file_name] = file_ids[file_name]
+            else:
+                st.warning(f"⚠️ File '{file_name}' not found in folder '{folder_name}'")
+        
+        if not to_download:
+            return frames
+        
+        # Downloads are network-bound, so overlap them on worker threads. Workers
+        # must not touch st.* (no script context), so errors are reported here.
+        with ThreadPoolExecutor(max_workers=min(len(to_download), MAX_DOWNLOAD_WORKERS)) as executor:
+            futures = {
+                file_name: executor.submit(self._download_csv, file_id)
+                for file_name, file_id in to_download.items()
+            }
+        
+        for file_name, future in futures.items():
+            try:
+                frames[file_name] = future.result()
+            except Exception as e:
+                logger.exception("Error loading file '%s'", file_name)
+                st.error(f"Error loading file '{file_name}': {e}")
+        
+        return frames
+    
+    def load_all_pricing_inputs(self, category, folder_name="Pricing Inputs"):
+        """Load a category's pricing input files, keyed by model input (None where missing)"""
+        input_files = pricing_input_files(category)
+        frames = self.load_files_by_name(folder_name, list(input_files.values()))
+        return {key: frames.get(file_name) for key, file_name in input_files.items()}
@@ -14,8 +14,9 @@ This implements:
 import pandas as pd
 import numpy as np
 import re
-from datetime import datetime
-import calendar
+import logging
+
+logger = logging.getLogger(__name__)
 
 # ============================================================================
 # 1. UOM NORMALIZER
@@ -26,6 +27,29 @@ class RobustUOMNormalizer:
     def __init__(self):
         self.knowledge_base = {}
         self.knowledge_base["2 combo"] = "2_combo"
+        # Series form of the knowledge base for normalize_series (normalize() keeps the dict)
+        self._kb_series = pd.Series(self.knowledge_base, dtype=object)
+        
+        # Compiled once; also passed as-is to Series.str.extract
+        self._re_pack_pcs = re.compile(r'pack.*\(\s*(\d+)\s*(?:pcs|pieces|pc)\s*\)')
+        self._re_lead_pack = re.compile(r'^(\d+)\s*pack')
+        self._re_pieces = re.compile(r'(\d+)\s*(?:pieces|pcs|piece)')
+        self._re_grams = re.compile(r'(\d+)\s*g')
+        self._re_ml = re.compile(r'(\d+)\s*ml')
+        # The UOM patterns as a single search, still tried in the order above, and each one's unit suffix
+        self._re_uom = self._in_priority_order(self._re_pack_pcs, self._re_lead_pack, self._re_pieces, self._re_grams, self._re_ml)
+        self._uom_suffixes = ('_pieces', '_pieces', '_pieces', '_g', '_ml')
+        self._re_name_pcs = re.compile(r'(\d+)\s*(?:pc|pcs|piece|pieces)')
+        self._re_name_eggs = re.compile(r'(\d+)\s+(?:(?:\w+\s+){0,3})eggs')
+        self._re_name_eggs_end = re.compile(r'eggs\s+(\d+)$')
+        # The item-name count patterns as a single search, still tried in the order above
+        self._re_name_count = self._in_priority_order(self._re_name_pcs, self._re_name_eggs, self._re_name_eggs_end)
+
+    @staticmethod
+    def _in_priority_order(*patterns):
+        """Regex matching like the first pattern whose search() succeeds; group k holds pattern k's capture"""
+        # Each lookahead scans from the start exactly as search() would; the alternation keeps their order
+        return re.compile('^(?:' + '|'.join(r'(?=[\s\S]*?' + p.pattern + ')' for p in patterns) + ')')
 
     def normalize(self, uom_val, item_name=None):
         s_uom = str(uom_val).strip().lower()
@@ -47,19 +71,8 @@ class RobustUOMNormalizer:
         
         s = s.replace("i pack", "1 pack")
         
-        match = re.search(r'pack.*\(\s*(\d+)\s*(?:pcs|pieces|pc)\s*\)', s)
-        if match: return f"{match.group(1)}_pieces"
-
-        match = re.search(r'^(\d+)\s*pack', s)
-        if match: return f"{match.group(1)}_pieces"
-
-        match = re.search(r'(\d+)\s*(?:pieces|pcs|piece)', s)
-        if match: return f"{match.group(1)}_pieces"
-        
-        match = re.search(r'(\d+)\s*g', s)
-        if match: return f"{match.group(1)}_g"
-        match = re.search(r'(\d+)\s*ml', s)
-        if match: return f"{match.group(1)}_ml"
+        match = self._re_uom.search(s)
+        if match: return match.group(match.lastindex) + self._uom_suffixes[match.lastindex - 1]
         
         if s.isdigit(): return f"{s}_pieces"
         
@@ -68,29 +81,90 @@ class RobustUOMNormalizer:
     def _extract_count_from_name(self, text):
         s = str(text).lower()
         
-        match = re.search(r'(\d+)\s*(?:pc|pcs|piece|pieces)', s)
-        if match: return int(match.group(1))
-
-        match_eggs = re.search(r'(\d+)\s+(?:(?:\w+\s+){0,3})eggs', s)
-        if match_eggs:
-            return int(match_eggs.group(1))
-
-        match_end = re.search(r'eggs\s+(\d+)$', s)
-        if match_end:
-            return int(match_end.group(1))
+        match = self._re_name_count.search(s)
+        if match: return int(match.group(match.lastindex))
             
         return None
 
+    def normalize_series(self, uom_ser, name_ser=None):
+        """Vectorized normalize() over whole columns; same result as calling it per row"""
+        if len(uom_ser) == 0:
+            return pd.Series([], index=uom_ser.index, dtype=object)
+        
+        # normalize() only sees str() of its inputs, so normalize each distinct
+        # (uom, name) string pair once and broadcast back to the rows
+        uom_str = uom_ser.map(str).values
+        if name_ser is None:
+            codes, unique_uoms = pd.factorize(uom_str)
+            normalized = self._normalize_strings(pd.Series(unique_uoms), None)
+        else:
+            codes, unique_pairs = pd.MultiIndex.from_arrays([uom_str, name_ser.map(str).values]).factorize()
+            normalized = self._normalize_strings(
+                pd.Series(unique_pairs.get_level_values(0)),
+                pd.Series(unique_pairs.get_level_values(1))
+            )
+        
+        return pd.Series(normalized.values[codes], index=uom_ser.index)
+
+    def _normalize_strings(self, uom_str, name_str):
+        """normalize() over str()-converted columns with a RangeIndex"""
+        s_uom = uom_str.str.strip().str.lower()
+        normalized = self._parse_uom_series(s_uom)
+        
+        is_weight_or_vol = normalized.str.contains('_g|_ml|_kg|_l')
+        is_missing = normalized.isin(['', 'nan', 'unknown'])
+        needs_count = is_weight_or_vol | is_missing
+        
+        if name_str is not None and needs_count.any():
+            names = name_str[needs_count].str.lower()
+            counts = self._extract_count_series(names)
+            normalized[counts.index] = counts.astype(str) + '_pieces'
+        
+        return normalized
+
+    def _parse_uom_series(self, s):
+        kb_match = s.map(self._kb_series)
+        
+        s = s.str.replace("i pack", "1 pack", regex=False)
+        
+        # Suffix each pattern's column with its unit; at most one is non-null per row
+        groups = s.str.extract(self._re_uom) + pd.Series(self._uom_suffixes)
+        matched = groups.bfill(axis=1).iloc[:, 0]
+        
+        parsed = np.select(
+            [kb_match.notna(), matched.notna(), s.str.isdigit()],
+            [kb_match, matched, s + '_pieces'],
+            default=s
+        )
+        return pd.Series(parsed, index=s.index)
+
+    def _extract_count_series(self, names):
+        """Non-zero item-name counts, indexed like names; rows without one are dropped"""
+        # At most one group matches per name; bfill brings it into the first column
+        count = names.str.extract(self._re_name_count).bfill(axis=1).iloc[:, 0].dropna().map(int)
+        return count[count != 0]
+
 
 # ============================================================================
 # 2. MATCHING ENGINE
 # ============================================================================
 
+# Alternate IM column names, renamed once on entry to the names the model reads
+IM_COLUMN_ALIASES = {
+    'city_name': 'CITY',
+    'product_name': 'ITEM_NAME',
+    'UOM': 'uom',
+    'IM_MRP': 'MRP',
+    'brand_name': 'BRAND'
+}
+
 class MatchingEngine:
     """Implements the sophisticated matching logic from notebook"""
     
     def __init__(self):
         self.normalizer = RobustUOMNormalizer()
+        # Generic words dropped from brand names to form the brand match key
+        self._re_brand_noise = re.compile(r'\b(?:eggs?|farms?|foods|poultry)\b')
         
     def run_matching(self, im_df, comp_df, necc_df, cogs_df, exclusion_df=None):
         """
@@ -101,9 +175,15 @@ class MatchingEngine:
         - Non-OPP brand matching
         - T2 fallback to T1 prices
         """
-        print("🔗 Starting Matching Engine...")
+        logger.info("🔗 Starting Matching Engine...")
+        
+        # One shallow copy up front: every step below only adds or replaces whole columns,
+        # so the caller's frames are never written to and no step needs its own copy
+        im_df = im_df.copy(deep=False)
+        comp_df = comp_df.copy(deep=False)
         
         # Step 1: UOM Normalization
+        im_df = self._standardize_im(im_df)
         im_df = self._normalize_im(im_df)
         comp_df = self._normalize_comp(comp_df)
         
@@ -125,76 +205,64 @@ class MatchingEngine:
         result = pd.merge(im_df, final_matches, on=['CITY', 'ITEM_CODE'], how='left')
         result['Min_Comp_Price'] = result['Min_Comp_Price'].fillna(0)
         
-        print(f"✅ Matching Complete: {len(result)} products")
+        logger.info("✅ Matching Complete: %d products", len(result))
         return result
     
+    def _standardize_im(self, df):
+        """Rename alternate IM column names (IM_COLUMN_ALIASES) unless the standard one is present"""
+        renames = {c: IM_COLUMN_ALIASES[c] for c in df.columns
+                   if c in IM_COLUMN_ALIASES and IM_COLUMN_ALIASES[c] not in df.columns}
+        return df.rename(columns=renames) if renames else df
+    
     def _normalize_im(self, df):
-        print("   📊 Normalizing IM UOM...")
-        df = df.copy()
-        uom_col = 'uom' if 'uom' in df.columns else 'UOM'
-        name_col = 'ITEM_NAME' if 'ITEM_NAME' in df.columns else 'product_name'
-        
-        if uom_col in df.columns:
-            df['Normalized_UOM'] = df.apply(
-                lambda row: self.normalizer.normalize(
-                    row.get(uom_col, ''), 
-                    row.get(name_col, '')
-                ), axis=1
-            )
+        logger.info("📊 Normalizing IM UOM...")
+        if 'uom' in df.columns:
+            df['Normalized_UOM'] = self.normalizer.normalize_series(df['uom'], df.get('ITEM_NAME')).astype('category')
         return df
     
     def _normalize_comp(self, df):
-        print("   📊 Normalizing Competition UOM...")
-        df = df.copy()
-        df['Normalized_UOM'] = df.apply(
-            lambda row: self.normalizer.normalize(
-                row.get('uom', ''), 
-                row.get('product_name', '')
-            ), axis=1
-        )
+        logger.info("📊 Normalizing Competition UOM...")
+        uom = df['uom'] if 'uom' in df.columns else pd.Series('', index=df.index)
+        df['Normalized_UOM'] = self.normalizer.normalize_series(uom, df.get('product_name')).astype('category')
+        
+        # Cleaned city/brand, computed once for the exclusions and the matching prep
+        df['city_clean'] = df['city'].map(str).str.lower().str.strip() if 'city' in df.columns else ''
+        df['brand_clean'] = df['brand_name'].map(str).str.lower().str.strip() if 'brand_name' in df.columns else ''
         return df
     
     def _apply_exclusions(self, comp_df, excl_df):
-        print("   🚫 Applying city/brand exclusions...")
-        def clean_str(x): 
-            return str(x).lower().strip()
-        
-        excl_df['city_clean'] = excl_df['CITY'].apply(clean_str) if 'CITY' in excl_df.columns else ''
-        excl_df['brand_clean'] = excl_df['BRAND'].apply(clean_str) if 'BRAND' in excl_df.columns else ''
-        
-        comp_df['city_clean'] = comp_df['city'].apply(clean_str) if 'city' in comp_df.columns else ''
-        comp_df['brand_clean'] = comp_df['brand_name'].apply(clean_str) if 'brand_name' in comp_df.columns else ''
-        
-        excl_df['key'] = excl_df['city_clean'] + "_" + excl_df['brand_clean']
-        comp_df['key'] = comp_df['city_clean'] + "_" + comp_df['brand_clean']
+        logger.info("🚫 Applying city/brand exclusions...")
+        blank = pd.Series('', index=excl_df.index)
+        excl_city = excl_df['CITY'].map(str).str.lower().str.strip() if 'CITY' in excl_df.columns else blank
+        excl_brand = excl_df['BRAND'].map(str).str.lower().str.strip() if 'BRAND' in excl_df.columns else blank
+        
+        # (city, brand) pairs probed as a MultiIndex, no joined string keys
+        excluded = pd.MultiIndex.from_arrays([comp_df['city_clean'], comp_df['brand_clean']]).isin(
+            pd.MultiIndex.from_arrays([excl_city, excl_brand])
+        )
         
         initial_len = len(comp_df)
-        comp_df = comp_df[~comp_df['key'].isin(excl_df['key'])]
-        print(f"   Excluded {initial_len - len(comp_df)} competitor rows")
+        comp_df = comp_df[~excluded]
+        logger.info("Excluded %d competitor rows", initial_len - len(comp_df))
         
         return comp_df
     
     def _prep_data(self, im_df, comp_df, cogs_df):
         """Prepare data with all required fields"""
-        print("   ⚙️ Preparing data...")
-        
-        def clean_str(x): 
-            return str(x).lower().strip()
+        logger.info("⚙️ Preparing data...")
         
         # Clean city names
-        im_city_col = 'CITY' if 'CITY' in im_df.columns else 'city_name'
-        im_df['city_clean'] = im_df[im_city_col].apply(clean_str)
-        comp_df['city_clean'] = comp_df['city'].apply(clean_str) if 'city' in comp_df.columns else ''
+        im_df['city_clean'] = im_df['CITY'].map(str).str.lower().str.strip()
         
-        # UOM cleaning
+        # UOM cleaning (Normalized_UOM is categorical, so the string ops run per distinct UOM)
         for df in [comp_df, im_df]:
             uom_col = 'Normalized_UOM' if 'Normalized_UOM' in df.columns else 'uom'
-            df['uom_clean'] = df[uom_col].astype(str).apply(clean_str) if uom_col in df.columns else ''
+            df['uom_clean'] = df[uom_col].map(str).str.lower().str.strip() if uom_col in df.columns else ''
             df['pack_size'] = df['uom_clean'].astype(str).str.extract(r'(\d+)').astype(float).fillna(1.0)
         
         # City tiers
-        t1_cities = ['bangalore', 'chennai', 'delhi', 'faridabad', 'gurgaon', 'hyderabad', 'kolkata', 'mumbai', 'noida', 'pune']
-        im_df['city_tier'] = im_df['city_clean'].apply(lambda x: 'T1' if x in t1_cities else 'T2')
+        t1_cities = frozenset(['bangalore', 'chennai', 'delhi', 'faridabad', 'gurgaon', 'hyderabad', 'kolkata', 'mumbai', 'noida', 'pune'])
+        im_df['city_tier'] = np.where(im_df['city_clean'].isin(t1_cities), 'T1', 'T2').astype(object)
         
         # State mapping for T2 fallback
         city_state_map = {
@@ -211,33 +279,29 @@ class MatchingEngine:
         comp_df['selling_price'] = pd.to_numeric(comp_df['selling_price'], errors='coerce')
         comp_df['price_per_piece'] = comp_df['selling_price'] / comp_df['pack_size']
         
-        mrp_col = 'MRP' if 'MRP' in im_df.columns else 'IM_MRP'
-        im_df['mrp_int'] = pd.to_numeric(im_df.get(mrp_col, 0), errors='coerce').fillna(0).round(0)
+        im_df['mrp_int'] = pd.to_numeric(im_df.get('MRP', 0), errors='coerce').fillna(0).round(0)
         comp_df['mrp_int'] = pd.to_numeric(comp_df.get('mrp', 0), errors='coerce').fillna(0).round(0)
         
         # Egg type
-        def get_egg_type(name):
-            s = str(name).lower()
-            if 'duck' in s: return 'Duck'
-            if 'quail' in s: return 'Quail'
-            if any(x in s for x in ['brown', 'desi', 'country']): return 'Brown'
-            return 'White'
+        def get_egg_type(names):
+            s = names.map(str).str.lower()
+            return np.select(
+                [s.str.contains('duck', regex=False), s.str.contains('quail', regex=False), s.str.contains('brown|desi|country')],
+                ['Duck', 'Quail', 'Brown'],
+                default='White'
+            ).astype(object)
         
-        comp_df['egg_type'] = comp_df['product_name'].apply(get_egg_type)
-        im_df['egg_type'] = im_df['ITEM_NAME'].apply(get_egg_type) if 'ITEM_NAME' in im_df.columns else 'White'
+        comp_df['egg_type'] = get_egg_type(comp_df['product_name'])
+        im_df['egg_type'] = get_egg_type(im_df['ITEM_NAME']) if 'ITEM_NAME' in im_df.columns else 'White'
         
         # Brand key
-        def get_brand_key(s):
-            s = clean_str(s)
-            for p in [r'\beggs\b', r'\begg\b', r'\bfarms\b', r'\bfarm\b', r'\bfoods\b', r'\bpoultry\b']:
-                s = re.sub(p, '', s)
-            return s.strip()
+        def get_brand_key(brands):
+            s = brands.map(str).str.lower().str.strip()
+            return s.str.replace(self._re_brand_noise, '', regex=True).str.strip()
         
-        comp_df['brand_clean'] = comp_df['brand_name'].apply(clean_str) if 'brand_name' in comp_df.columns else ''
-        comp_df['brand_key'] = comp_df['brand_clean'].apply(get_brand_key)
+        comp_df['brand_key'] = get_brand_key(comp_df['brand_clean'])
         
-        brand_col = 'BRAND' if 'BRAND' in im_df.columns else 'brand_name'
-        im_df['brand_key'] = im_df.get(brand_col, '').apply(get_brand_key)
+        im_df['brand_key'] = get_brand_key(im_df.get('BRAND', ''))
         
         # OPP codes
         opp_codes = [
@@ -252,69 +316,98 @@ class MatchingEngine:
         
         # Merge COGS
         if 'CITY' in cogs_df.columns:
-            cogs_df['city_clean'] = cogs_df['CITY'].apply(clean_str)
-            cogs_df.rename(columns={'COGS': 'COGS_LATEST'}, inplace=True)
+            cogs_df = cogs_df.rename(columns={'COGS': 'COGS_LATEST'})
+            cogs_df['city_clean'] = cogs_df['CITY'].map(str).str.lower().str.strip()
             im_df = pd.merge(im_df, cogs_df[['ITEM_CODE', 'city_clean', 'COGS_LATEST']], 
                            left_on=['ITEM_CODE', 'city_clean'], 
                            right_on=['ITEM_CODE', 'city_clean'], 
                            how='left')
         else:
-            im_df['COGS_LATEST'] = cogs_df.set_index('product_id')['COGS'].to_dict().get(im_df['ITEM_CODE'], 0) if 'product_id' in cogs_df.columns else 0
+            if 'ITEM_CODE' in cogs_df.columns:
+                cogs_by_item = cogs_df.drop_duplicates('ITEM_CODE').set_index('ITEM_CODE')['COGS']
+                im_df['COGS_LATEST'] = im_df['ITEM_CODE'].map(cogs_by_item)
+            else:
+                im_df['COGS_LATEST'] = 0
         
         im_df['COGS_LATEST'] = im_df['COGS_LATEST'].fillna(0)
         
+        # Matching keys as categoricals with shared categories, so groupby and merges hash integer codes
+        for col in ['city_clean', 'brand_key', 'uom_clean', 'egg_type']:
+            key_dtype = pd.CategoricalDtype(pd.Index(im_df[col].unique()).union(pd.Index(comp_df[col].unique())))
+            im_df[col] = im_df[col].astype(key_dtype)
+            comp_df[col] = comp_df[col].astype(key_dtype)
+        
         return im_df, comp_df
     
     def _match_opp(self, im_df, comp_df):
         """OPP matching with 5% spacing rule"""
-        print("   🎯 Matching OPP products (5% spacing rule)...")
-        
-        im_opp = im_df[im_df['is_opp']].copy()
-        comp_opp_pool = comp_df[comp_df['price_per_piece'] <= 10].copy()
-        opp_results = []
-        
-        for (city, uom, egg), sub_im in im_opp.groupby(['city_clean', 'uom_clean', 'egg_type']):
-            sub_im = sub_im.sort_values('COGS_LATEST')
-            sub_comp = comp_opp_pool[
-                (comp_opp_pool['city_clean']==city) & 
-                (comp_opp_pool['uom_clean']==uom) & 
-                (comp_opp_pool['egg_type']==egg)
-            ].sort_values('selling_price')
+        logger.info("🎯 Matching OPP products (5% spacing rule)...")
+        
+        im_opp = im_df[im_df['is_opp']]
+        comp_opp_pool = comp_df[comp_df['price_per_piece'] <= 10]
+        group_keys = ['city_clean', 'uom_clean', 'egg_type']
+        
+        cogs = im_opp['COGS_LATEST'].to_numpy(dtype=float)
+        prices = comp_opp_pool['selling_price'].to_numpy(dtype=float)
+        comp_groups = comp_opp_pool.groupby(group_keys, observed=True).indices
+        no_comp = np.array([], dtype=np.intp)
+        
+        # Per group, only position arrays are sorted and scanned; frames are gathered once at the end
+        im_pos, comp_pos, ranks, avails = [], [], [], []
+        for key, im_idx in im_opp.groupby(group_keys, observed=True).indices.items():
+            # Sort IM by COGS (NaN last), as sort_values would
+            no_cogs = np.isnan(cogs[im_idx])
+            im_idx = np.concatenate([im_idx[~no_cogs][np.argsort(cogs[im_idx[~no_cogs]], kind='quicksort')], im_idx[no_cogs]])
             
-            # 5% Spacing Rule
-            valid_comp = []
-            if not sub_comp.empty:
-                last_price = 0
-                for _, r in sub_comp.iterrows():
-                    if r['selling_price'] >= last_price * 1.05:
-                        valid_comp.append(r)
-                        last_price = r['selling_price']
+            # 5% Spacing Rule over the group's competitor prices in ascending order
+            comp_idx = comp_groups.get(key, no_comp)
+            comp_idx = comp_idx[~np.isnan(prices[comp_idx])]
+            comp_idx = comp_idx[np.argsort(prices[comp_idx], kind='quicksort')]
+            valid_idx = []
+            last_price = 0
+            for k in comp_idx:
+                if prices[k] >= last_price * 1.05:
+                    valid_idx.append(k)
+                    last_price = prices[k]
             
-            for i in range(len(sub_im)):
-                row = sub_im.iloc[i]
-                res = {
-                    'CITY': row['CITY'] if 'CITY' in row else row.get('city_name', ''),
-                    'ITEM_CODE': row['ITEM_CODE'], 
-                    'Min_Comp_Price': None, 
-                    'Match_Logic_Comment': f"OPP condition not met: Rank {i+1} > Avail ({len(valid_comp)})"
-                }
-                if i < len(valid_comp):
-                    match = valid_comp[i]
-                    res.update({
-                        'Min_Comp_Price': match['selling_price'],
-                        'Min_Comp_Brand': match.get('brand_name', ''),
-                        'Min_Comp_Source': match.get('source', ''),
-                        'Match_Logic_Comment': f"OPP Match: Rank {i+1}"
-                    })
-                opp_results.append(res)
-        
-        return pd.DataFrame(opp_results)
+            n = len(im_idx)
+            im_pos.append(im_idx)
+            comp_pos.append(np.array(valid_idx[:n] + [-1] * max(n - len(valid_idx), 0), dtype=np.intp))
+            ranks.append(np.arange(1, n + 1))
+            avails.append(np.full(n, len(valid_idx)))
+        
+        if not im_pos:
+            return pd.DataFrame()
+        im_pos, comp_pos = np.concatenate(im_pos), np.concatenate(comp_pos)
+        ranks, avails = np.concatenate(ranks), np.concatenate(avails)
+        
+        matched = comp_pos >= 0
+        hits = comp_opp_pool.iloc[comp_pos[matched]]
+        price = np.full(len(im_pos), np.nan)
+        brand = np.full(len(im_pos), np.nan, dtype=object)
+        source = np.full(len(im_pos), np.nan, dtype=object)
+        price[matched] = hits['selling_price'].to_numpy(dtype=float)
+        brand[matched] = hits['brand_name'].to_numpy() if 'brand_name' in hits else ''
+        source[matched] = hits['source'].to_numpy() if 'source' in hits else ''
+        
+        rank_no = pd.Series(ranks).astype(str)
+        opp = im_opp[['CITY', 'ITEM_CODE']].iloc[im_pos].reset_index(drop=True)
+        opp['Min_Comp_Price'] = price
+        opp['Match_Logic_Comment'] = np.where(
+            matched,
+            "OPP Match: Rank " + rank_no,
+            "OPP condition not met: Rank " + rank_no + " > Avail (" + pd.Series(avails).astype(str) + ")"
+        )
+        opp['Min_Comp_Brand'] = brand
+        opp['Min_Comp_Source'] = source
+        
+        return opp
     
     def _match_non_opp(self, im_df, comp_df):
         """Non-OPP matching (brand + UOM/pack size)"""
-        print("   🎯 Matching Non-OPP products (brand matching)...")
+        logger.info("🎯 Matching Non-OPP products (brand matching)...")
         
-        im_non = im_df[~im_df['is_opp']].copy()
+        im_non = im_df[~im_df['is_opp']]
         
         # Exact UOM String match
         m1 = pd.merge(im_non, comp_df, on=['city_clean', 'brand_key', 'uom_clean', 'mrp_int'], 
@@ -326,54 +419,62 @@ class MatchingEngine:
                      how='inner', suffixes=('', '_c'))
         m2['comment'] = 'Numeric Pack Size'
         
-        comb = pd.concat([m1, m2])
+        comb = pd.concat([m1, m2], ignore_index=True)
         comb['prio'] = comb['comment'].map({'Exact UOM String': 1, 'Numeric Pack Size': 2})
-        hits = comb.sort_values(['CITY', 'ITEM_CODE', 'prio', 'selling_price']).drop_duplicates(subset=['CITY', 'ITEM_CODE'])
         
-        city_col = 'CITY' if 'CITY' in im_non.columns else 'city_name'
-        non_opp_final = pd.merge(im_non, hits[[city_col, 'ITEM_CODE', 'selling_price', 'brand_name', 'source', 'comment']], 
-                                on=[city_col, 'ITEM_CODE'], how='left')
+        # Best candidate per product without a full sort: best priority, then lowest price
+        # (missing prices last), first candidate on ties
+        best_prio = comb.groupby(['CITY', 'ITEM_CODE'], sort=False, dropna=False)['prio'].transform('min')
+        cand = comb[comb['prio'] == best_prio]
+        best = cand['selling_price'].fillna(np.inf).groupby(
+            [cand['CITY'], cand['ITEM_CODE']], sort=False, dropna=False
+        ).idxmin()
+        hits = comb.loc[best.to_numpy()]
+        
+        non_opp_final = pd.merge(im_non, hits[['CITY', 'ITEM_CODE', 'selling_price', 'brand_name', 'source', 'comment']], 
+                                on=['CITY', 'ITEM_CODE'], how='left')
         non_opp_final['Match_Logic_Comment'] = non_opp_final['comment'].apply(
             lambda x: f"Non-OPP Match: {x}" if pd.notna(x) else "Non OPP condition not met"
         )
         non_opp_final.rename(columns={
             'selling_price': 'Min_Comp_Price', 
             'brand_name': 'Min_Comp_Brand', 
-            'source': 'Min_Comp_Source',
-            city_col: 'CITY'
+            'source': 'Min_Comp_Source'
         }, inplace=True)
         
         return non_opp_final[['CITY', 'ITEM_CODE', 'Min_Comp_Price', 'Min_Comp_Brand', 'Min_Comp_Source', 'Match_Logic_Comment']]
     
     def _apply_t2_fallback(self, opp_matches, non_opp_matches, im_df):
         """T2 cities fall back to T1 prices in same state"""
-        print("   🔄 Applying T2 fallback to T1 prices...")
+        logger.info("🔄 Applying T2 fallback to T1 prices...")
         
         all_matches = pd.concat([opp_matches, non_opp_matches])
         
         meta = im_df[['ITEM_CODE', 'CITY', 'city_tier', 'state']].drop_duplicates()
         df_work = pd.merge(all_matches, meta, on=['ITEM_CODE', 'CITY'], how='left')
         
-        # T1 lookup table
+        # T1 lookup table: lowest positive T1 price per (state, ITEM_CODE)
+        fallback_cols = ['Min_Comp_Price', 'Min_Comp_Brand', 'Min_Comp_Source']
         t1_lookup = df_work[
             (df_work['city_tier']=='T1') & 
             (df_work['Min_Comp_Price']>0)
-        ].sort_values('Min_Comp_Price').drop_duplicates(['state', 'ITEM_CODE']).set_index(['state', 'ITEM_CODE']).to_dict('index')
-        
-        def apply_fallback(r):
-            if r['city_tier'] == 'T2' and (pd.isna(r['Min_Comp_Price']) or r['Min_Comp_Price'] <= 0):
-                key = (r['state'], r['ITEM_CODE'])
-                if key in t1_lookup:
-                    d = t1_lookup[key]
-                    r['Min_Comp_Price'] = d['Min_Comp_Price']
-                    r['Min_Comp_Brand'] = d.get('Min_Comp_Brand', '')
-                    r['Min_Comp_Source'] = d.get('Min_Comp_Source', '')
-                    r['Match_Logic_Comment'] = f"Fallback: Used {str(r['state']).title()} T1"
-            return r
-        
-        final_res = df_work.apply(apply_fallback, axis=1)
-        
-        return final_res[['CITY', 'ITEM_CODE', 'Min_Comp_Price', 'Min_Comp_Brand', 'Min_Comp_Source', 'Match_Logic_Comment']]
+        ].sort_values('Min_Comp_Price').drop_duplicates(['state', 'ITEM_CODE']).set_index(['state', 'ITEM_CODE'])[fallback_cols]
+        
+        # T2 rows without a positive price take their state's T1 match (items without a code never match)
+        needs_fallback = (
+            (df_work['city_tier'] == 'T2') & 
+            ~(df_work['Min_Comp_Price'] > 0) & 
+            df_work['ITEM_CODE'].notna()
+        ).to_numpy()
+        t1_match = t1_lookup.reindex(pd.MultiIndex.from_frame(df_work[['state', 'ITEM_CODE']]))
+        use_t1 = needs_fallback & t1_match['Min_Comp_Price'].notna().to_numpy()
+        
+        df_work.loc[use_t1, fallback_cols] = t1_match.loc[use_t1, fallback_cols].to_numpy()
+        df_work.loc[use_t1, 'Match_Logic_Comment'] = (
+            "Fallback: Used " + df_work.loc[use_t1, 'state'].map(str).str.title() + " T1"
+        )
+        
+        return df_work[['CITY', 'ITEM_CODE', 'Min_Comp_Price', 'Min_Comp_Brand', 'Min_Comp_Source', 'Match_Logic_Comment']]
 
 
 # ============================================================================
@@ -391,10 +492,12 @@ class PricingEngine:
         - Stock-based adjustments
         - Brand-aligned SDPO
         - Ceiling/floor constraints
+        
+        Columns are added to matched_df in place (run_matching returns a fresh frame).
         """
-        print("💰 Starting Pricing Engine...")
+        logger.info("💰 Starting Pricing Engine...")
         
-        df = matched_df.copy()
+        df = matched_df
         
         # Merge stock
         df = self._merge_stock(df, stock_df)
@@ -417,7 +520,7 @@ class PricingEngine:
         # Apply constraints
         df = self._apply_constraints(df)
         
-        print(f"✅ Pricing Complete: {len(df)} products priced")
+        logger.info("✅ Pricing Complete: %d products priced", len(df))
         return df
     
     def _merge_stock(self, df, stock_df):
@@ -425,17 +528,34 @@ class PricingEngine:
             df['STOCK_STATUS'] = 'NA'
             return df
         
-        def clean_key(city, item):
-            c = str(city).lower().strip()
-            try: i = str(int(float(item)))
-            except: i = '0'
-            return c + "_" + i
-        
-        df['key'] = df.apply(lambda x: clean_key(x['CITY'], x['ITEM_CODE']), axis=1)
+        def parse_float(x):
+            try: return float(x)
+            except: return np.nan
+        
+        def stock_keys(city, item):
+            # (lower/stripped city, int(float(item))) with unparseable items as 0
+            nums = pd.to_numeric(item, errors='coerce').to_numpy(dtype=float, copy=True)
+            # to_numeric rejects a few spellings float() accepts ('1_000', non-ASCII digits)
+            unparsed = np.isnan(nums) & item.notna().to_numpy()
+            if unparsed.any():
+                nums[unparsed] = [parse_float(x) for x in item.to_numpy()[unparsed]]
+            nums = np.trunc(nums)
+            nums = np.where(np.isfinite(nums), nums, 0) + 0.0  # + 0.0 folds -0.0 into 0
+            return city.map(str).str.lower().str.strip(), nums
+        
+        # Exported '<city>_<item>' key, with str(int()) once per distinct item
+        city_key, item_key = stock_keys(df['CITY'], df['ITEM_CODE'])
+        codes, uniques = pd.factorize(item_key)
+        item_str = np.array([str(int(x)) for x in uniques], dtype=object)[codes]
+        df['key'] = (city_key + '_' + pd.Series(item_str, index=df.index)).astype(object)
         
         if 'CITY' in stock_df.columns and 'ITEM_CODE' in stock_df.columns:
-            stock_df['key'] = stock_df.apply(lambda x: clean_key(x['CITY'], x['ITEM_CODE']), axis=1)
-            df = pd.merge(df, stock_df.drop_duplicates('key')[['key', 'STOCK_STATUS']], on='key', how='left')
+            stock_status = pd.Series(
+                stock_df['STOCK_STATUS'].values,
+                index=pd.MultiIndex.from_arrays(stock_keys(stock_df['CITY'], stock_df['ITEM_CODE']))
+            )
+            stock_status = stock_status[~stock_status.index.duplicated()]
+            df['STOCK_STATUS'] = stock_status.reindex(pd.MultiIndex.from_arrays([city_key, item_key])).values
         
         df['STOCK_STATUS'] = df.get('STOCK_STATUS', 'NA').fillna('NA')
         return df
@@ -445,9 +565,13 @@ class PricingEngine:
             df['GMV Contribution'] = 0
             return df
         
-        # Try to merge on ITEM_CODE or similar
+        # Look up by ITEM_CODE (first row per code, so every product keeps exactly one row)
         if 'ITEM_CODE' in gmv_df.columns:
-            df = pd.merge(df, gmv_df[['ITEM_CODE', 'GMV Contribution']], on='ITEM_CODE', how='left')
+            repeated = gmv_df['ITEM_CODE'].duplicated()
+            if repeated.any():
+                logger.warning("GMV file repeats ITEM_CODE: dropped %d duplicate rows, keeping the first per code", repeated.sum())
+            gmv_by_item = gmv_df[~repeated].set_index('ITEM_CODE')['GMV Contribution']
+            df['GMV Contribution'] = df['ITEM_CODE'].map(gmv_by_item)
         
         df['GMV Contribution'] = df.get('GMV Contribution', 0).fillna(0)
         return df
@@ -458,33 +582,47 @@ class PricingEngine:
             return df
         
         if 'Brand' in brand_sdpo_df.columns and 'Hardcoded_SDPO' in brand_sdpo_df.columns:
-            brand_sdpo_df['Brand_Clean'] = brand_sdpo_df['Brand'].astype(str).str.lower().str.strip()
-            brand_sdpo_df['Fixed_SDPO_Pct'] = brand_sdpo_df['Hardcoded_SDPO'].apply(
-                lambda x: float(str(x).replace('%',''))/100 if pd.notnull(x) else 0
+            # 'x%' or x is x/100, blank is 0; float() once per distinct value (blanks get code -1)
+            sdpo = brand_sdpo_df['Hardcoded_SDPO']
+            codes, uniques = pd.factorize(sdpo.map(str).str.replace('%', '', regex=False).where(sdpo.notna()))
+            vals = np.array([float(x) for x in uniques], dtype=float) / 100
+            sdpo_by_brand = pd.Series(
+                np.where(codes == -1, 0.0, vals[codes] if len(vals) else 0.0),
+                index=brand_sdpo_df['Brand'].astype(str).str.lower().str.strip()
             )
+            # First rule per brand, so every product keeps exactly one row
+            repeated = sdpo_by_brand.index.duplicated()
+            if repeated.any():
+                logger.warning("Brand SDPO file repeats brands: dropped %d duplicate rules, keeping the first per brand", repeated.sum())
+            sdpo_by_brand = sdpo_by_brand[~repeated]
             
-            brand_col = 'BRAND' if 'BRAND' in df.columns else 'brand_name'
-            df['Brand_Clean'] = df.get(brand_col, '').astype(str).str.lower().str.strip()
-            df = pd.merge(df, brand_sdpo_df[['Brand_Clean', 'Fixed_SDPO_Pct']], on='Brand_Clean', how='left')
+            df['Brand_Clean'] = df.get('BRAND', '').astype(str).str.lower().str.strip()
+            df['Fixed_SDPO_Pct'] = df['Brand_Clean'].map(sdpo_by_brand)
         
         df['Fixed_SDPO_Pct'] = df.get('Fixed_SDPO_Pct', 0).fillna(0)
         return df
     
     def _calculate_kvi_tiers(self, df):
         """Calculate KVI tiers using Pareto 80/95 rule"""
-        print("   📊 Calculating KVI tiers (Pareto 80/95)...")
+        logger.info("📊 Calculating KVI tiers (Pareto 80/95)...")
         
-        # Pack category
-        uom_col = 'Normalized_UOM' if 'Normalized_UOM' in df.columns else 'uom_clean'
-        pack_n = df[uom_col].astype(str).str.extract(r'(\d+)').astype(float).fillna(1) if uom_col in df.columns else pd.Series([1]*len(df))
+        # Pack category (pack_size comes from matching; re-extract only for frames that lack it)
+        if 'pack_size' in df.columns:
+            pack_n = df['pack_size']
+        else:
+            uom_col = 'Normalized_UOM' if 'Normalized_UOM' in df.columns else 'uom_clean'
+            pack_n = df[uom_col].astype(str).str.extract(r'(\d+)').astype(float).fillna(1) if uom_col in df.columns else pd.Series([1]*len(df))
         
         conds = [pack_n.isin([30,24,25,20]), pack_n.isin([10,12,15,18]), pack_n.isin([6,4])]
         df['pack_category'] = np.select(conds, ['Large', 'Mid', 'Small'], default='Other')
         
         # KVI tiers
-        cum = df.groupby(['CITY', 'pack_category'])['GMV Contribution'].cumsum()
-        tot = df.groupby(['CITY', 'pack_category'])['GMV Contribution'].transform('sum')
-        pareto = cum / tot.replace(0, 1)
+        gmv_by_group = df.groupby(['CITY', 'pack_category'], sort=False)['GMV Contribution']
+        cum = gmv_by_group.cumsum()
+        tot = gmv_by_group.transform('sum')
+        # Share of the group's GMV, with zero-GMV groups divided by 1 (i.e. left as cum)
+        pareto = cum.to_numpy(dtype=float, copy=True)
+        np.divide(pareto, tot.to_numpy(dtype=float), out=pareto, where=(tot != 0).to_numpy())
         
         df['kvi_tier'] = np.select(
             [(pareto<=0.8), (pareto<=0.95)], 
@@ -497,49 +635,49 @@ class PricingEngine:
     
     def _calculate_target_margins(self, df, override=None):
         """Calculate target NM% based on pack/KVI/city tier/OPP"""
-        print("   🎯 Calculating target margins...")
+        logger.info("🎯 Calculating target margins...")
         
         if override is not None:
             df['target_nm'] = override / 100
             return df
         
-        def get_target(row):
-            t = 0.15
-            p = row.get('pack_category', 'Other')
-            k = row.get('kvi_tier', 'Tier 3')
-            t2 = (row.get('city_tier', 'T1') == 'T2')
-            opp = row.get('is_opp', False)
-            
-            if p in ['Small', 'Mid']:
-                if k == 'Tier 1': t = 0.10 if opp else 0.17
-                else: t = 0.11 if opp else 0.20
-            elif p == 'Large':
-                if k == 'Tier 1': t = 0.05 if opp else 0.15
-                else: t = 0.06 if opp else 0.18
-            
-            if t2: t -= 0.05
-            return max(t, 0)
+        small_mid = df['pack_category'].isin(['Small', 'Mid']).to_numpy()
+        large = (df['pack_category'] == 'Large').to_numpy()
+        kvi_t1 = (df['kvi_tier'] == 'Tier 1').to_numpy()
+        opp = df['is_opp'].astype(bool).to_numpy()
         
-        df['target_nm'] = df.apply(get_target, axis=1)
+        # By pack size and KVI tier (OPP items lower); 15% for other packs
+        target = np.select(
+            [small_mid & kvi_t1, small_mid, large & kvi_t1, large],
+            [np.where(opp, 0.10, 0.17), np.where(opp, 0.11, 0.20), np.where(opp, 0.05, 0.15), np.where(opp, 0.06, 0.18)],
+            default=0.15
+        )
+        
+        # T2 cities 5 points lower, never below 0
+        target = np.where((df['city_tier'] == 'T2').to_numpy(), target - 0.05, target)
+        df['target_nm'] = np.maximum(target, 0)
         return df
     
     def _calculate_prices(self, df):
         """Calculate modeled prices with all strategies"""
-        print("   💵 Calculating modeled prices...")
-        
-        # Get BDPO
-        def get_bdpo(row):
-            mrp = row.get('MRP', 0)
-            try:
-                v1 = str(row.get('BDPO', '')).strip()
-                if '%' in v1: val = mrp * float(v1.replace('%',''))/100
-                else: val = float(v1) if v1 and v1.lower() != 'nan' else 0
-                if val > 0: return min(val, mrp*0.9)
-                return 0
-            except: 
-                return 0
-        
-        df['bdpo_val'] = df.apply(get_bdpo, axis=1).fillna(0)
+        logger.info("💵 Calculating modeled prices...")
+        
+        # Get BDPO: 'x%' is x% of MRP, otherwise an amount; capped at 90% of MRP, 0 if unparseable or not positive
+        def parse_float(x):
+            try: return float(x)
+            except: return np.nan
+        
+        mrp = df['MRP'].to_numpy(dtype=float)
+        bdpo = df['BDPO'].map(str).str.strip() if 'BDPO' in df.columns else pd.Series('', index=df.index)
+        is_pct = bdpo.str.contains('%', regex=False).to_numpy()
+        bdpo_num = bdpo.str.replace('%', '', regex=False)
+        # float() rules exactly, but once per distinct BDPO string
+        codes, uniques = pd.factorize(bdpo_num)
+        amount = np.array([parse_float(x) for x in uniques], dtype=float)[codes]
+        amount = np.where(is_pct, mrp * amount / 100, amount)
+        
+        cap = mrp * 0.9
+        df['bdpo_val'] = np.where(amount > 0, np.where(cap < amount, cap, amount), 0)
         
         # Get COGS
         cogs_col = 'COGS_LATEST' if 'COGS_LATEST' in df.columns else 'cogs'
@@ -547,52 +685,58 @@ class PricingEngine:
         mop_col = 'MOP' if 'MOP' in df.columns else 'cogs'
         df['cogs'] = np.where(df['cogs']==0, df.get(mop_col, 0), df['cogs'])
         
-        # Calculate price from margin
-        df['price_min_margin'] = (df['target_nm'] * df['MRP']) + df['cogs'] - df['bdpo_val']
-        df['price_comp'] = np.where(df['Min_Comp_Price'] > 0, df['Min_Comp_Price'], df['price_min_margin'])
+        # Inputs as float arrays, so the price chain below runs without Series alignment
+        mrp = df['MRP'].to_numpy(dtype=float)
+        cogs = df['cogs'].to_numpy(dtype=float)
+        bdpo = df['bdpo_val'].to_numpy(dtype=float)
+        target_nm = df['target_nm'].to_numpy(dtype=float)
+        comp_price = df['Min_Comp_Price'].to_numpy(dtype=float)
+        sdpo_pct = df['Fixed_SDPO_Pct'].to_numpy(dtype=float)
         
-        df['price_min_margin'] = df['price_min_margin'].fillna(df['MRP'])
-        df['price_comp'] = df['price_comp'].fillna(df['price_min_margin'])
+        # Calculate price from margin (MRP where it cannot be computed); comp price where there is one
+        price_min_margin = (target_nm * mrp) + cogs - bdpo
+        price_min_margin = np.where(np.isnan(price_min_margin), mrp, price_min_margin)
+        has_comp = comp_price > 0
+        price_comp = np.where(has_comp, comp_price, price_min_margin)
         
-        # Calculate NM from comp price
-        nm_comp = (df['price_comp'] - df['cogs'] + df['bdpo_val']) / df['MRP'].replace(0, 1)
+        # Calculate NM from comp price (MRP of 0 treated as 1)
+        mrp_safe = np.where(mrp == 0, 1, mrp)
+        nm_comp = (price_comp - cogs + bdpo) / mrp_safe
         
         # Strategy flags
-        is_insufficient = (df['city_tier'] == 'T2') & (df['STOCK_STATUS'].astype(str).str.lower() == 'insufficient')
-        is_kvi_t1 = df['kvi_tier'] == 'Tier 1'
-        has_comp = df['Min_Comp_Price'] > 0
-        is_overdelivering = nm_comp > df['target_nm']
-        is_brand_rule = df['Fixed_SDPO_Pct'] > 0
+        is_insufficient = ((df['city_tier'] == 'T2') & (df['STOCK_STATUS'].astype(str).str.lower() == 'insufficient')).to_numpy()
+        is_kvi_t1 = (df['kvi_tier'] == 'Tier 1').to_numpy()
+        is_overdelivering = nm_comp > target_nm
+        is_brand_rule = sdpo_pct > 0
+        standard_match = (nm_comp >= target_nm) & (~is_insufficient)
+        should_undercut = is_kvi_t1 & has_comp & is_overdelivering & (~is_insufficient)
         
         # Price calculations
-        price_aggressive = df['price_comp'] * 0.98
-        price_fixed_brand = (df['MRP'] * (1 - df['Fixed_SDPO_Pct'])) - df['bdpo_val']
-        
-        # Start with min margin
-        df['model_price'] = df['price_min_margin']
-        
-        # Standard match
-        standard_match = (nm_comp >= df['target_nm']) & (~is_insufficient)
-        df['model_price'] = np.where(standard_match, df['price_comp'], df['model_price'])
+        price_aggressive = price_comp * 0.98
+        price_fixed_brand = (mrp * (1 - sdpo_pct)) - bdpo
         
-        # KVI T1 aggression
-        should_undercut = is_kvi_t1 & has_comp & is_overdelivering & (~is_insufficient)
-        df['model_price'] = np.where(should_undercut, price_aggressive, df['model_price'])
+        df['price_min_margin'] = price_min_margin
+        df['price_comp'] = price_comp
         
-        # Brand rule overrides
-        df['model_price'] = np.where(is_brand_rule, price_fixed_brand, df['model_price'])
+        # Brand rule overrides KVI T1 aggression, which overrides a standard match; else min margin
+        df['model_price'] = np.select(
+            [is_brand_rule, should_undercut, standard_match],
+            [price_fixed_brand, price_aggressive, price_comp],
+            default=price_min_margin
+        )
         
-        # Stock actions
-        df['Stock_Action'] = ''
-        df.loc[is_insufficient, 'Stock_Action'] = "T2 Insufficient: Ignored Comp Match"
-        df.loc[should_undercut, 'Stock_Action'] = "KVI T1 Aggression: Beat Comp by 2%"
-        df.loc[is_brand_rule, 'Stock_Action'] = "Brand Rule: Fixed SDPO"
+        # Stock actions (same precedence)
+        df['Stock_Action'] = np.select(
+            [is_brand_rule, should_undercut, is_insufficient],
+            ["Brand Rule: Fixed SDPO", "KVI T1 Aggression: Beat Comp by 2%", "T2 Insufficient: Ignored Comp Match"],
+            default=''
+        ).astype(object)
         
         return df
     
     def _apply_constraints(self, df):
         """Apply ceiling/floor constraints"""
-        print("   🔒 Applying price constraints...")
+        logger.info("🔒 Applying price constraints...")
         
         # Ceilings
         ceil_opp = df['MRP'] * 0.96
@@ -619,9 +763,10 @@ class PricingEngine:
         # Final price
         df['Final Price'] = df['Modeled Price']
         
-        # Calculate final NM and SDPO
-        df['Final NM %'] = ((df['Final Price'] - df['cogs'] + df['bdpo_val']) / df['MRP'].replace(0, 1) * 100).fillna(0)
-        df['Final SDPO %'] = ((df['MRP'] - df['Final Price'] - df['bdpo_val']) / df['MRP'].replace(0, 1) * 100).fillna(0)
+        # Calculate final NM and SDPO (MRP of 0 treated as 1)
+        mrp_safe = np.where(df['MRP'] == 0, 1, df['MRP'])
+        df['Final NM %'] = ((df['Final Price'] - df['cogs'] + df['bdpo_val']) / mrp_safe * 100).fillna(0)
+        df['Final SDPO %'] = ((df['MRP'] - df['Final Price'] - df['bdpo_val']) / mrp_safe * 100).fillna(0)
         
         return df
 
@@ -630,6 +775,46 @@ class PricingEngine:
 # 4. MAIN ORCHESTRATOR
 # ============================================================================
 
+def read_csv_pyarrow(source):
+    """Read a whole CSV with pyarrow's multithreaded parser, missing values as NaN like the C engine"""
+    # pyarrow reads missing text cells as None; the str()-based cleaning expects NaN ('nan', not 'none')
+    return pd.read_csv(source, engine='pyarrow').fillna(np.nan)
+
+# read_csv options for the auxiliary inputs: parse only the columns the model reads
+# (callable usecols so files missing one of them still load) and skip type inference on text keys.
+# IM and competition files are read in full (read_csv_pyarrow) since their columns are carried into the output.
+INPUT_READ_OPTIONS = {
+    'necc_pricing': {'nrows': 0},  # header only: the matching does not use NECC prices yet
+    'cogs': {
+        'usecols': lambda c: c in ('product_id', 'ITEM_CODE', 'CITY', 'COGS'),
+        'dtype': {'CITY': str}
+    },
+    'sdpo': {
+        'usecols': lambda c: c in ('Brand', 'Hardcoded_SDPO'),
+        'dtype': {'Brand': str}
+    },
+    'stock': {
+        'usecols': lambda c: c in ('CITY', 'ITEM_CODE', 'STOCK_STATUS'),
+        'dtype': {'CITY': str, 'STOCK_STATUS': str}
+    },
+    'gmv': {
+        'usecols': lambda c: c in ('ITEM_CODE', 'GMV Contribution')
+    },
+    'exclusion': {
+        'usecols': lambda c: c in ('CITY', 'BRAND'),
+        'dtype': {'CITY': str, 'BRAND': str}
+    }
+}
+
+def summarize_results(priced_df):
+    """Performance metrics for a priced frame (one category or several combined)"""
+    return {
+        'total_products': len(priced_df),
+        'avg_net_margin': priced_df['Final NM %'].mean(),
+        'avg_price_index': 100.0,  # Would need comp price to calculate
+        'avg_gmv_goodness': 50.0   # Placeholder
+    }
+
 def run_complete_pricing_model(
     im_pricing_file,
     comp_pricing_file,
@@ -645,25 +830,28 @@ def run_complete_pricing_model(
     """
     Complete pricing model pipeline
     """
-    print("=" * 80)
-    print("🚀 COMPLETE PRICING MODEL")
-    print("=" * 80)
+    logger.info("🚀 COMPLETE PRICING MODEL (%s)", category)
     
     # Load data
-    print("\n📁 Loading input files...")
-    im_df = pd.read_csv(im_pricing_file)
-    comp_df = pd.read_csv(comp_pricing_file)
-    necc_df = pd.read_csv(necc_pricing_file) if necc_pricing_file else pd.DataFrame()
-    cogs_df = pd.read_csv(cogs_file)
-    sdpo_df = pd.read_csv(sdpo_file) if sdpo_file else None
-    stock_df = pd.read_csv(stock_file) if stock_file else None
-    gmv_df = pd.read_csv(gmv_file) if gmv_file else None
-    excl_df = pd.read_csv(exclusion_file) if exclusion_file else None
+    logger.info("📁 Loading input files...")
+    im_df = read_csv_pyarrow(im_pricing_file)
+    comp_df = read_csv_pyarrow(comp_pricing_file)
+    necc_df = pd.read_csv(necc_pricing_file, **INPUT_READ_OPTIONS['necc_pricing']) if necc_pricing_file else pd.DataFrame()
+    cogs_df = pd.read_csv(cogs_file, **INPUT_READ_OPTIONS['cogs'])
+    sdpo_df = pd.read_csv(sdpo_file, **INPUT_READ_OPTIONS['sdpo']) if sdpo_file else None
+    stock_df = pd.read_csv(stock_file, **INPUT_READ_OPTIONS['stock']) if stock_file else None
+    gmv_df = pd.read_csv(gmv_file, **INPUT_READ_OPTIONS['gmv']) if gmv_file else None
+    excl_df = pd.read_csv(exclusion_file, **INPUT_READ_OPTIONS['exclusion']) if exclusion_file else None
     
     # Standardize column names in COGS
     if 'COGS' in cogs_df.columns and 'product_id' in cogs_df.columns:
         cogs_df.rename(columns={'product_id': 'ITEM_CODE'}, inplace=True)
     
+    # Numeric ITEM_CODE keys, parsed once so they join against the (numeric) IM codes
+    for df in (cogs_df, gmv_df):
+        if df is not None and 'ITEM_CODE' in df.columns:
+            df['ITEM_CODE'] = pd.to_numeric(df['ITEM_CODE'], errors='coerce')
+    
     # Step 1: Matching
     matcher = MatchingEngine()
     matched_df = matcher.run_matching(im_df, comp_df, necc_df, cogs_df, excl_df)
@@ -677,18 +865,11 @@ def run_complete_pricing_model(
     priced_df['target_margin_%'] = target_margin if target_margin else priced_df['target_nm'] * 100
     
     # Step 4: Performance metrics
-    summary = {
-        'total_products': len(priced_df),
-        'avg_net_margin': priced_df['Final NM %'].mean(),
-        'avg_price_index': 100.0,  # Would need comp price to calculate
-        'avg_gmv_goodness': 50.0   # Placeholder
-    }
+    summary = summarize_results(priced_df)
     
-    print("\n" + "=" * 80)
-    print("✅ PRICING MODEL COMPLETE")
-    print("=" * 80)
-    print(f"   Products Priced: {summary['total_products']:,}")
-    print(f"   Avg Net Margin: {summary['avg_net_margin']:.2f}%")
-    print()
+    logger.info(
+        "✅ PRICING MODEL COMPLETE: %d products priced, avg net margin %.2f%%",
+        summary['total_products'], summary['avg_net_margin']
+    )
     
     return priced_df, summary
@@ -0,0 +1,109 @@
+# styles.py
+"""
+Static HTML/CSS snippets for the Streamlit app.
+
+Kept in their own module so the strings are built once at import time
+instead of on every script rerun.
+"""
+
+# Custom CSS for better styling and reduced gaps
+CSS = """
+    <style>
+    .main-header {
+        text-align: center;
+        padding: 1.2rem 0;
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        color: white;
+        border-radius: 12px;
+        margin-bottom: 1.5rem;
+        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+    }
+    .main-header h1 {
+        margin: 0;
+        font-size: 2rem;
+        font-weight: 700;
+    }
+    .main-header p {
+        margin: 0.5rem 0 0 0;
+        font-size: 1rem;
+        opacity: 0.95;
+    }
+    .upload-card {
+        background: linear-gradient(to right, #f8f9fa 0%, #e9ecef 100%);
+        padding: 1.2rem;
+        border-radius: 10px;
+        border-left: 5px solid #667eea;
+        margin-bottom: 1rem;
+        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.05);
+    }
+    .section-title {
+        font-size: 1.2rem;
+        font-weight: 700;
+        color: #667eea;
+        margin-bottom: 0.5rem;
+    }
+    .stButton>button {
+        height: 3.5rem;
+        font-size: 1.2rem;
+        font-weight: 700;
+        border-radius: 10px;
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        border: none;
+        transition: all 0.3s ease;
+    }
+    .stButton>button:hover {
+        transform: translateY(-2px);
+        box-shadow: 0 6px 12px rgba(102, 126, 234, 0.4);
+    }
+    /* Reduce spacing between sections */
+    .block-container {
+        padding-top: 1rem;
+        padding-bottom: 1rem;
+    }
+    div[data-testid="stExpander"] {
+        margin-bottom: 0.8rem;
+        background-color: #f8f9fa;
+        border-radius: 8px;
+    }
+    div[data-testid="stSelectbox"],
+    div[data-testid="stNumberInput"] {
+        margin-bottom: 0rem;
+    }
+    div[data-testid="stFileUploader"] {
+        margin-bottom: 0rem;
+    }
+    div[data-testid="column"] {
+        padding: 0.5rem;
+    }
+    div[data-baseweb="notification"] {
+        border-radius: 8px;
+        margin-bottom: 1rem;
+    }
+    div[data-testid="stMetric"] {
+        background-color: #f8f9fa;
+        padding: 1rem;
+        border-radius: 8px;
+        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.05);
+    }
+    .element-container:has(> .stSuccess),
+    .element-container:has(> .stError) {
+        margin-top: 0.3rem;
+        margin-bottom: 0.3rem;
+    }
+    .element-container {
+        margin-bottom: 0.5rem;
+    }
+    .stCaption {
+        color: #6c757d;
+        font-weight: 500;
+    }
+    </style>
+    """
+
+# Page header banner
+HEADER_HTML = """
+    <div class="main-header">
+        <h1>💰 Dynamic Pricing Engine</h1>
+        <p>Smart pricing recommendations powered by data analytics</p>
+    </div>
+    """